@@ -1,12 +1,50 @@
 import logging
 import os
 
+import numpy as np
+import qt
 import vtk
 
 import slicer
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
-from qt import QCursor
+
+#
+# Cursor translation kernel
+#
+
+def updateTranslations(matrices, positions):
+    """
+    Write the N x 3 positions into the translation column of the N row-major 4x4 matrices
+    stored flattened in the N x 16 matrices array.
+    """
+    matrices[:, 3] = positions[:, 0]
+    matrices[:, 7] = positions[:, 1]
+    matrices[:, 11] = positions[:, 2]
+
+
+_updateTranslationsKernel = None
+
+
+def getUpdateTranslationsKernel():
+    """
+    Return updateTranslations compiled with numba when it is usable, or the plain NumPy version.
+    Numba is imported and the kernel compiled on first call only, to keep module loading fast.
+    """
+    global _updateTranslationsKernel
+    if _updateTranslationsKernel is None:
+        try:
+            import numba
+            # Compiled once for the only signature used, and cached on disk
+            _updateTranslationsKernel = numba.njit("void(float64[:, :], float64[:, :])", cache=True)(updateTranslations)
+        except ImportError:
+            _updateTranslationsKernel = updateTranslations
+        except Exception as e:
+            # Broken numba/llvmlite install or compilation failure
+            logging.warning(f"Failed to compile cursor translation kernel with numba, using NumPy instead: {e}")
+            _updateTranslationsKernel = updateTranslations
+    return _updateTranslationsKernel
+
 
 #
 # VirtualCursor
@@ -173,8 +211,9 @@ class VirtualCursorWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self._updatingGUIFromParameterNode = False
 
         # Now update the view from parameter node
-        self.logic.enableCursor(self.ui.enableCheckBox.checked)
+        # Scale is set first so that enabling the cursor applies it in the same display node batch
         self.logic.setCursorScale(self.ui.scaleSliderWidget.value)
+        self.logic.enableCursor(self.ui.enableCheckBox.checked)
 
     def updateParameterNodeFromGUI(self, caller=None, event=None):
         """
@@ -214,15 +253,53 @@ class VirtualCursorLogic(ScriptedLoadableModuleLogic):
 
         self._cursorNode = None
         self._transformNode = None
+        self._cursorTransform = None
+        # Last state requested, so that repeated parameter node updates are no-ops.
+        # The scale is kept while the cursor is disabled and applied when it is enabled.
+        self._cursorEnabled = False
+        self._cursorScale = None
+        # Last cursor position scheduled for the next transform update
+        self._lastP = (None, None, None)
+        # Cursor matrices (N x 16, row-major) and positions (N x 3) stored as contiguous arrays
+        self._cursorMatrices = np.eye(4).reshape(1, 16)
+        self._cursorPositions = np.zeros((1, 3))
+        # Buffer filled in place with the crosshair RAS position
+        self._pBuf = self._cursorPositions[0]
+
+        # References cached when the cursor is added, enabled or first moved, used by processMouseMoveEvent
+        self._displayNode = None
+        self._setMatrix = None
+        self._getRAS = None
+        self._setCursor = None
+        self._updateTranslations = None
 
         self._crosshairNode = slicer.util.getNode("Crosshair")
 
-        # Set the app override cursor to default arrow
-        # to access it later in processMouseMoveEvent
-        slicer.app.setOverrideCursor(QCursor(0))
+        # Cursors are created when the virtual cursor is first enabled and the current shape
+        # is tracked here to avoid querying the app override cursor on every mouse move
+        self._arrowCursor = None
+        self._blankCursor = None
+        self._currentCursorShape = 0
+        # Visibility last set on the cursor display node
+        self._cursorVisible = False
 
         self._observerId = -1;
 
+        # Cullers removed from the 3D view renderers while the cursor is enabled, by renderer.
+        # Opt-in only, see setCullersRemovalEnabled
+        self._cullersRemovalEnabled = False
+        self._removedCullers = {}
+        self._layoutManagerObserved = False
+
+        # Coalesce mouse moves so that the transform is written at most once per event loop iteration
+        self._pendingUpdate = False
+        # Cursor visibility to apply together with the pending transform update
+        self._pendingVisible = False
+        self._updateTimer = qt.QTimer()
+        self._updateTimer.setSingleShot(True)
+        self._updateTimer.setInterval(0)
+        self._updateTimer.connect("timeout()", self._applyPendingMove)
+
 
     def setDefaultParameters(self, parameterNode):
         """
@@ -240,25 +317,45 @@ class VirtualCursorLogic(ScriptedLoadableModuleLogic):
             self._cursorNode.AddControlPoint(0,0,0)
             self._cursorNode.SetNthControlPointLabel(0, "")
             self._cursorNode.LockedOn() # Don't react to interactions
+            # The cursor is not a landmark: keep it out of selection, editors and saved scenes
+            self._cursorNode.SelectableOff()
+            self._cursorNode.HideFromEditorsOn()
+            self._cursorNode.SaveWithSceneOff()
 
             if slicer.mrmlScene is not None:
                 slicer.mrmlScene.AddNode(self._cursorNode)
+                # Create the display node now rather than relying on lazy creation
+                self._cursorNode.CreateDefaultDisplayNodes()
+                self._displayNode = self._cursorNode.GetDisplayNode()
+                self._displayNode.HideFromEditorsOn()
+                self._displayNode.SaveWithSceneOff()
 
         if self._transformNode is None:
             # Create transform and assign it to the markups node
-            matrix = vtk.vtkMatrix4x4()
-            matrix.Identity()
+            # The node observes the vtkTransform, which is updated in place on mouse move
+            transform = vtk.vtkTransform()
+            self._cursorTransform = transform
             self._transformNode = slicer.vtkMRMLTransformNode()
-            self._transformNode.SetMatrixTransformToParent(matrix)
+            self._transformNode.SetAndObserveTransformToParent(transform)
+            self._transformNode.HideFromEditorsOn()
+            self._transformNode.SaveWithSceneOff()
 
             if slicer.mrmlScene is not None:
                 slicer.mrmlScene.AddNode(self._transformNode)
                 self._cursorNode.SetAndObserveTransformNodeID(self._transformNode.GetID())
 
     def removeCursorNode(self):
+        # Stop mouse move processing before any reference is released
+        if self._crosshairNode is not None and self._observerId != -1:
+            self._crosshairNode.RemoveObserver(self._observerId)
+            self._observerId = -1
+        self._updateTimer.stop()
+        self._pendingUpdate = False
+        self._pendingVisible = False
+
         if self._cursorNode is not None and slicer.mrmlScene is not None:
-            if self._cursorNode.GetDisplayNode() is not None:
-                slicer.mrmlScene.RemoveNode(self._cursorNode.GetDisplayNode())
+            if self._displayNode is not None:
+                slicer.mrmlScene.RemoveNode(self._displayNode)
             slicer.mrmlScene.RemoveNode(self._cursorNode)
 
             self._cursorNode = None
@@ -266,56 +363,278 @@ class VirtualCursorLogic(ScriptedLoadableModuleLogic):
         if self._transformNode is not None and slicer.mrmlScene is not None:
             slicer.mrmlScene.RemoveNode(self._transformNode)
             self._transformNode = None
+            self._cursorTransform = None
+            self._lastP = (None, None, None)
+
+        self._displayNode = None
+        self._setMatrix = None
+        self._getRAS = None
+        self._setCursor = None
+        self._updateTranslations = None
+        self._cursorVisible = False
 
     def enableCursor(self, enable):
+        if enable == self._cursorEnabled:
+            return
+        self._cursorEnabled = enable
+
         if enable:
+            if self._arrowCursor is None:
+                self._arrowCursor = qt.QCursor(0)
+                self._blankCursor = qt.QCursor(10)
+
+                # Set the app override cursor to default arrow
+                slicer.app.setOverrideCursor(self._arrowCursor)
+                self._currentCursorShape = 0
+
             self.addCursorNode()
 
-            if self._cursorNode is not None and self._cursorNode.GetDisplayNode() is not None:
+            if self._displayNode is not None:
+                displayNode = self._displayNode
+                wasModified = displayNode.StartModify()  # Modify all properties in a single batch
                 # Hide virtual cursor until the mouse is moved
-                self._cursorNode.GetDisplayNode().VisibilityOff()
+                displayNode.VisibilityOff()
+                self._cursorVisible = False
                 # Do not write to the Z-buffer to prevent picking the cursor node in QuickPick
-                self._cursorNode.GetDisplayNode().SetOpacity(0.9999)
+                displayNode.SetOpacity(0.9999)
                 # Turn on occluded visibility to keep track of (partially) occluded cursors
-                self._cursorNode.GetDisplayNode().OccludedVisibilityOn()
-                self._cursorNode.GetDisplayNode().SetOccludedOpacity(0.3)
-
-            if self._crosshairNode is not None and self._observerId == -1:
-                self._observerId = self._crosshairNode.AddObserver(slicer.vtkMRMLCrosshairNode.CursorPositionModifiedEvent, self.processMouseMoveEvent)
+                displayNode.OccludedVisibilityOn()
+                displayNode.SetOccludedOpacity(0.3)
+                # Skip rendering of labels and interaction handles
+                displayNode.SetPointLabelsVisibility(False)
+                displayNode.SetPropertiesLabelVisibility(False)
+                displayNode.HandlesInteractiveOff()
+                if self._cursorScale is not None:
+                    displayNode.SetGlyphScale(self._cursorScale)
+                displayNode.EndModify(wasModified)
+
+                # Cache references used on every mouse move
+                self._setMatrix = self._cursorTransform.SetMatrix
+                self._setCursor = slicer.app.setOverrideCursor
+
+                # Observe mouse moves only once everything used by processMouseMoveEvent exists
+                if self._crosshairNode is not None and self._observerId == -1:
+                    self._getRAS = self._crosshairNode.GetCursorPositionRAS
+                    # Low priority so that other crosshair observers (e.g. view interactions) run first
+                    self._observerId = self._crosshairNode.AddObserver(slicer.vtkMRMLCrosshairNode.CursorPositionModifiedEvent, self.processMouseMoveEvent, -1.0)
+
+            if self._cullersRemovalEnabled:
+                self.removeCullers()
         else:
             self.removeCursorNode()
+            self.restoreCullers()
+
+            # App override cursor is only set once the virtual cursor has been enabled
+            if self._arrowCursor is not None:
+                slicer.app.setOverrideCursor(self._arrowCursor)
+                self._currentCursorShape = 0
+
+    def setCullersRemovalEnabled(self, enable):
+        """
+        Remove the culler of the 3D view renderers while the cursor is enabled (off by default).
+        This disables frustum culling for every prop in the 3D views, not only for the cursor,
+        so it should only be turned on for scenes where it is measured to be faster.
+        """
+        self._cullersRemovalEnabled = enable
+        if enable and self._cursorEnabled:
+            self.removeCullers()
+        elif not enable:
+            self.restoreCullers()
+
+    def removeCullers(self):
+        """
+        Remove the culler of the 3D view renderers that still have one.
+        This disables frustum culling for every prop in these views, not only for the cursor:
+        it saves the per-frame culling pass in small scenes but can slow down rendering of large ones.
+        3D views created later, e.g. after a layout switch, are handled when the layout changes.
+        """
+        layoutManager = slicer.app.layoutManager()
+        if layoutManager is None:
+            return
+
+        if not self._layoutManagerObserved:
+            layoutManager.connect("layoutChanged(int)", self.onLayoutChanged)
+            self._layoutManagerObserved = True
+
+        for i in range(layoutManager.threeDViewCount):
+            renderer = layoutManager.threeDWidget(i).threeDView().renderer()
+            if renderer is None or renderer in self._removedCullers:
+                continue
+            culler = renderer.GetCullers().GetLastItem()
+            if culler is not None:
+                renderer.RemoveCuller(culler)
+                self._removedCullers[renderer] = culler
+
+    def restoreCullers(self):
+        """
+        Add back the cullers removed by removeCullers.
+        """
+        layoutManager = slicer.app.layoutManager()
+        if layoutManager is not None and self._layoutManagerObserved:
+            layoutManager.disconnect("layoutChanged(int)", self.onLayoutChanged)
+        self._layoutManagerObserved = False
 
-            if self._crosshairNode is not None and self._observerId != -1:
-                self._crosshairNode.RemoveObserver(self._observerId)
-                self._observerId = -1
+        for renderer, culler in self._removedCullers.items():
+            renderer.AddCuller(culler)
+        self._removedCullers = {}
 
-            slicer.app.setOverrideCursor(QCursor(0))
+    def onLayoutChanged(self, layout):
+        # New 3D views may have been created
+        self.removeCullers()
 
     def setCursorScale(self, scale):
-        if self._cursorNode is not None and self._cursorNode.GetDisplayNode() is not None:
-            self._cursorNode.GetDisplayNode().SetGlyphScale(scale)
+        if scale == self._cursorScale:
+            return
+        self._cursorScale = scale
+        if self._displayNode is not None:
+            self._displayNode.SetGlyphScale(scale)
 
     def processMouseMoveEvent(self, observer, eventid):
-        if self._crosshairNode is None or self._cursorNode is None or self._transformNode is None or self._cursorNode.GetDisplayNode() is None:
-            return;
-
-        p=[0,0,0]
+        # Only observed while the cursor nodes exist, see enableCursor and removeCursorNode
+        p = self._pBuf
         # Get cursor position and update cursor shape
-        if self._crosshairNode.GetCursorPositionRAS(p):
+        visible = bool(self._getRAS(p))
+        if visible:
           # Hide mouse cursor for valid pick
-          if slicer.app.overrideCursor().shape() != 10:
-            slicer.app.setOverrideCursor(QCursor(10))
-            self._cursorNode.GetDisplayNode().VisibilityOn()
+          if self._currentCursorShape != 10:
+            self._setCursor(self._blankCursor)
+            self._currentCursorShape = 10
         else:
           # Set back to default cursor when leaving views
-          if slicer.app.overrideCursor().shape() != 0:
-            slicer.app.setOverrideCursor(QCursor(0))
-            self._cursorNode.GetDisplayNode().VisibilityOff()
+          if self._currentCursorShape != 0:
+            self._setCursor(self._arrowCursor)
+            self._currentCursorShape = 0
+
+        # Nothing to update if the cursor did not move nor change visibility
+        tp = (p[0], p[1], p[2])
+        if tp == self._lastP and visible == self._pendingVisible:
+            return
+        self._lastP = tp
+        self._pendingVisible = visible
+
+        # Defer the transform and visibility update to the next event loop iteration
+        # so that the cursor is never rendered at a stale position
+        self._pendingUpdate = True
+        if not self._updateTimer.isActive():
+            self._updateTimer.start()
+
+    def _applyPendingMove(self):
+        if not self._pendingUpdate:
+            return
+        self._pendingUpdate = False
+
+        # Kernel is resolved on the first move, not when the cursor is enabled at module setup
+        if self._updateTranslations is None:
+            self._updateTranslations = getUpdateTranslationsKernel()
+
+        # Update virtual cursor transform, only the translation changes
+        self._updateTranslations(self._cursorMatrices, self._cursorPositions)
+        self._setMatrix(self._cursorMatrices[0])
+
+        if self._pendingVisible != self._cursorVisible:
+            self._displayNode.SetVisibility(self._pendingVisible)
+            self._cursorVisible = self._pendingVisible
+
+
+#
+# VirtualCursorTest
+#
+
+class VirtualCursorTest(ScriptedLoadableModuleTest):
+    """
+    This is the test case for your scripted module.
+    Uses ScriptedLoadableModuleTest base class, available at:
+    https://github.com/Slicer/Slicer/blob/main/Base/Python/slicer/ScriptedLoadableModule.py
+    """
+
+    def setUp(self):
+        """ Do whatever is needed to reset the state - typically a scene clear will be enough.
+        """
+        slicer.mrmlScene.Clear()
+
+    def runTest(self):
+        """Run as few or as many tests as needed here.
+        """
+        self.setUp()
+        self.test_updateTranslations()
+        self.setUp()
+        self.test_cursorFollowsCrosshair()
+
+    def test_updateTranslations(self):
+        """
+        Check that only the translation column of each matrix is written, with both
+        the NumPy version and the kernel returned by getUpdateTranslationsKernel.
+        """
+        self.delayDisplay("Starting the test")
+
+        for kernel in (updateTranslations, getUpdateTranslationsKernel()):
+            rotations = np.arange(3 * 16, dtype=np.float64).reshape(3, 16)
+            matrices = rotations.copy()
+            positions = np.array([[1.0, 2.0, 3.0], [-4.0, 5.5, 0.0], [7.0, -8.0, 9.25]])
+
+            kernel(matrices, positions)
+
+            for i in range(3):
+                matrix = matrices[i].reshape(4, 4)
+                np.testing.assert_array_equal(matrix[:3, 3], positions[i])
+                np.testing.assert_array_equal(matrix[:, :3], rotations[i].reshape(4, 4)[:, :3])
+                np.testing.assert_array_equal(matrix[3, :], rotations[i].reshape(4, 4)[3, :])
+
+        self.delayDisplay("Test passed")
+
+    def test_cursorFollowsCrosshair(self):
+        """
+        Check that the cursor transform and visibility follow the crosshair position,
+        and that disabling the cursor removes its nodes and stops observing the crosshair.
+        """
+        self.delayDisplay("Starting the test")
+
+        logic = VirtualCursorLogic()
+        logic.enableCursor(True)
+
+        cursorNode = logic._cursorNode
+        displayNode = logic._displayNode
+        transformNode = logic._transformNode
+        self.assertIsNotNone(cursorNode)
+        self.assertIsNotNone(displayNode)
+        self.assertIsNotNone(transformNode)
+        self.assertFalse(displayNode.GetVisibility())
+
+        transformModifiedCount = [0]
+        def onTransformModified(caller, event):
+            transformModifiedCount[0] += 1
+        transformObserverId = transformNode.AddObserver(slicer.vtkMRMLTransformNode.TransformModifiedEvent, onTransformModified)
+
+        # Valid position: cursor is moved and shown
+        crosshairNode = slicer.util.getNode("Crosshair")
+        crosshairNode.SetCursorPositionRAS([10.0, -20.0, 30.5])
+        slicer.app.processEvents()
 
-        # Update virtual cursor transform
         matrix = vtk.vtkMatrix4x4()
-        self._transformNode.GetMatrixTransformToParent(matrix)
-        matrix.SetElement(0, 3, p[0])
-        matrix.SetElement(1, 3, p[1])
-        matrix.SetElement(2, 3, p[2])
-        self._transformNode.SetMatrixTransformToParent(matrix)
+        transformNode.GetMatrixTransformToParent(matrix)
+        self.assertEqual([matrix.GetElement(i, 3) for i in range(3)], [10.0, -20.0, 30.5])
+        self.assertTrue(displayNode.GetVisibility())
+        modifiedCountAfterMove = transformModifiedCount[0]
+        self.assertGreater(modifiedCountAfterMove, 0)
+
+        # Same position: transform is not modified again
+        crosshairNode.SetCursorPositionRAS([10.0, -20.0, 30.5])
+        slicer.app.processEvents()
+        self.assertEqual(transformModifiedCount[0], modifiedCountAfterMove)
+
+        # Invalid position: cursor is hidden
+        crosshairNode.SetCursorPositionInvalid()
+        slicer.app.processEvents()
+        self.assertFalse(displayNode.GetVisibility())
+
+        transformNode.RemoveObserver(transformObserverId)
+
+        # Disabled cursor: nodes are removed, crosshair is not observed and no update is pending
+        logic.enableCursor(False)
+        self.assertIsNone(cursorNode.GetScene())
+        self.assertIsNone(displayNode.GetScene())
+        self.assertIsNone(transformNode.GetScene())
+        self.assertEqual(logic._observerId, -1)
+        self.assertFalse(logic._updateTimer.isActive())
+
+        self.delayDisplay("Test passed")